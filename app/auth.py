@@ -38,6 +38,9 @@ except Exception as e:
 
 cognito = boto3.client("cognito-idp", region_name=REGION)
 
+# Cognito group whose members may use admin-only features such as profiling
+ADMIN_GROUP = "admin"
+
 # === Secret hash helper ===
 def calculate_secret_hash(username: str) -> str:
     if not CLIENT_SECRET:
@@ -102,4 +105,16 @@ def verify_jwt_token(token: str) -> Dict[str, Any]:
     except jwt.ExpiredSignatureError:
         raise HTTPException(401, "Token expired")
     except jwt.InvalidTokenError as e:
-        raise HTTPException(401, f"Invalid token: {str(e)}")
\ No newline at end of file
+        raise HTTPException(401, f"Invalid token: {str(e)}")
+
+def is_admin_request(headers) -> bool:
+    """True when the bearer token in headers belongs to a member of ADMIN_GROUP."""
+    auth = headers.get("authorization", "")
+    if not auth.lower().startswith("bearer "):
+        return False
+    try:
+        payload = verify_jwt_token(auth.split(" ", 1)[1])
+    except Exception:
+        # An unverifiable token just means no profiling, never a failed request
+        return False
+    return ADMIN_GROUP in payload.get("cognito:groups", [])
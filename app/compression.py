@@ -0,0 +1,29 @@
+from fastapi.middleware.gzip import GZipMiddleware
+
+# Brotli is preferred when installed; gzip from Starlette is the fallback
+try:
+    from brotli_asgi import BrotliMiddleware
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BrotliMiddleware = None
+    BROTLI_AVAILABLE = False
+
+# Streamed binary responses are sent as-is: compressing them buffers chunks
+# and delays the first frame for little size gain
+UNCOMPRESSED_PATHS = ("/fractals/animate",)
+
+class CompressionMiddleware:
+    """Compress HTML, JSON and binary geometry responses with brotli or gzip."""
+
+    def __init__(self, app, minimum_size=500):
+        self.app = app
+        if BROTLI_AVAILABLE:
+            self.compressed_app = BrotliMiddleware(app, minimum_size=minimum_size, gzip_fallback=True)
+        else:
+            self.compressed_app = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not scope["path"].startswith(UNCOMPRESSED_PATHS):
+            await self.compressed_app(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
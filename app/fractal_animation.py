@@ -0,0 +1,150 @@
+import io, struct
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PolyCollection, PatchCollection
+from matplotlib.colors import to_rgba
+from matplotlib.patches import Circle
+from PIL import Image
+from fractal_geometry import iter_levels, lsystem_bounds, LSYSTEM_TYPES
+
+# Animated depth progression, streamed as a GIF one frame at a time.
+# A single figure is kept for the whole animation and each level only adds
+# (or swaps) the artists for that level's geometry. Every frame is encoded
+# and yielded as soon as it is drawn, so memory does not grow with the
+# number of frames and the first bytes go out before level 2 is computed.
+
+FRAME_SIZE_PX = 480
+FRAME_DELAY_MS = 600
+LAST_FRAME_DELAY_MS = 2000
+FRAME_COLORS = 64
+
+AXIS_LIMITS = {
+    "tree": ((-4, 4), (-2, 6)),
+    "snowflake": ((-3, 3), (-3, 3)),
+    "sierpinski": ((-2.5, 2.5), (-2.5, 2.5)),
+    "dragon": ((-3, 3), (-2, 2)),
+    "fern": ((-3, 3), (0, 10)),
+    "circles": ((-3, 3), (-3, 3))
+}
+
+def _new_figure(fractal_type, depth):
+    # Use the object-oriented API rather than pyplot: the generator is
+    # consumed from a worker thread and must not touch pyplot's global state
+    fig = Figure(figsize=(FRAME_SIZE_PX / 80, FRAME_SIZE_PX / 80), dpi=80, facecolor="black")
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_axes([0.02, 0.02, 0.96, 0.9])
+    ax.set_axis_off()
+    ax.set_facecolor("black")
+    ax.set_aspect("equal")
+    if fractal_type in LSYSTEM_TYPES:
+        # Fixed limits for every frame; these curves change extent per level
+        xlim, ylim = lsystem_bounds(fractal_type, depth)
+    else:
+        xlim, ylim = AXIS_LIMITS[fractal_type]
+    ax.set_xlim(*xlim)
+    ax.set_ylim(*ylim)
+    return fig, canvas, ax
+
+def _draw_levels(fractal_type, depth, color, ax):
+    """Add each level's geometry to ax, yielding once per drawn level."""
+    levels = iter_levels(fractal_type, depth)
+
+    if fractal_type == "tree":
+        for segments, depth_left in levels:
+            colors = np.tile(to_rgba(color), (len(segments), 1))
+            colors[:, 3] = 0.3 + 0.7 * (depth_left / depth)
+            ax.add_collection(LineCollection(segments, colors=colors,
+                                             linewidths=np.maximum(0.5, depth_left * 0.6)))
+            yield
+
+    elif fractal_type in ("snowflake", "dragon"):
+        line, = ax.plot([], [], color=color, linewidth=1)
+        for points in levels:
+            line.set_data(points[:, 0], points[:, 1])
+            yield
+
+    elif fractal_type == "sierpinski":
+        triangles = PolyCollection([], facecolors=color, edgecolors="none", alpha=0.7)
+        ax.add_collection(triangles)
+        for vertices in levels:
+            triangles.set_verts(vertices)
+            yield
+
+    elif fractal_type == "circles":
+        for centers, radii in levels:
+            circles = [Circle(center, radius) for center, radius in zip(centers, radii)]
+            ax.add_collection(PatchCollection(circles, facecolors="none", edgecolors=color,
+                                              linewidths=1, alpha=0.7))
+            yield
+
+    elif fractal_type == "fern":
+        for points in levels:
+            ax.scatter(points[:, 0], points[:, 1], color=color, s=0.3, alpha=0.6)
+            yield
+
+    elif fractal_type in LSYSTEM_TYPES:
+        lines = LineCollection([], colors=color, linewidths=1)
+        ax.add_collection(lines)
+        for segments in levels:
+            lines.set_segments(segments)
+            yield
+
+def _split_single_gif(data):
+    """Return the image block of a one-frame GIF with its palette made local."""
+    packed = data[10]
+    pos = 13
+    color_table, table_bits = b"", 0
+    if packed & 0x80:
+        table_bits = packed & 0x07
+        size = 3 * (2 << table_bits)
+        color_table = data[pos:pos + size]
+        pos += size
+
+    # Skip any extension blocks before the image descriptor
+    while data[pos] == 0x21:
+        pos += 2
+        while data[pos]:
+            pos += data[pos] + 1
+        pos += 1
+    if data[pos] != 0x2C or data[-1] != 0x3B:
+        raise ValueError("Unexpected GIF layout from encoder")
+
+    block = bytearray(data[pos:-1])
+    if not block[9] & 0x80 and color_table:
+        block[9] = (block[9] & 0x78) | 0x80 | table_bits
+        block[10:10] = color_table
+    return bytes(block)
+
+def _gif_header(width, height):
+    screen = b"GIF89a" + struct.pack("<HHBBB", width, height, 0, 0, 0)
+    loop = b"\x21\xFF\x0BNETSCAPE2.0\x03\x01" + struct.pack("<H", 0) + b"\x00"
+    return screen + loop
+
+def _gif_control(delay_ms):
+    # Graphic control extension: keep the previous frame, delay in 1/100 s
+    return b"\x21\xF9\x04\x04" + struct.pack("<H", delay_ms // 10) + b"\x00\x00"
+
+def _gif_image(rgba):
+    image = Image.fromarray(np.ascontiguousarray(rgba[..., :3])).quantize(colors=FRAME_COLORS)
+    buf = io.BytesIO()
+    image.save(buf, format="GIF", optimize=False)
+    return _split_single_gif(buf.getvalue())
+
+def iter_animation_gif(fractal_type, depth, color, title=None):
+    """Yield an animated GIF of levels 1..depth as a stream of byte chunks."""
+    fig, canvas, ax = _new_figure(fractal_type, depth)
+    width, height = canvas.get_width_height()
+    yield _gif_header(width, height)
+
+    image = None
+    for level, _ in enumerate(_draw_levels(fractal_type, depth, color, ax), start=1):
+        ax.set_title(f"{title or fractal_type} (Depth: {level})", color="white", fontsize=12)
+        canvas.draw()
+        image = _gif_image(np.asarray(canvas.buffer_rgba()))
+        yield _gif_control(FRAME_DELAY_MS) + image
+
+    # Hold the finished fractal before the animation loops
+    if image is not None:
+        yield _gif_control(LAST_FRAME_DELAY_MS) + image
+    yield b"\x3B"
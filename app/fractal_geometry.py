@@ -0,0 +1,258 @@
+import functools, struct
+import numpy as np
+from lsystem import LSYSTEMS, lsystem_segments, lsystem_polyline
+
+# Level-by-level fractal geometry as NumPy arrays, one item per depth level.
+# Tree, sierpinski, circles and fern build each level from the previous
+# level's arrays, so walking to depth N never recomputes levels 1..N-1.
+# Snowflake, dragon and the other L-system curves reuse only the memoized
+# symbol string of the previous level: every level is re-interpreted,
+# because refining a curve replaces every segment rather than adding to it.
+# Each level is several times larger than the one before (4x for Koch, 2x
+# for dragon), so all levels together cost a small constant factor more
+# than the final level alone.
+# Growing types (tree, circles, fern) yield only the new primitives of each
+# level; refining types (snowflake, dragon, sierpinski) yield the whole
+# refined shape.
+
+# Same depth caps as the static renderer in fractal_service.py
+DEPTH_LIMITS = {
+    "tree": 8,
+    "snowflake": 6,
+    "sierpinski": 7,
+    "dragon": 15,
+    "fern": 8,
+    "circles": 6
+}
+
+def iter_tree_levels(depth):
+    """Yield (segments, depth_left) for each generation of branches.
+
+    segments has shape (n, 2, 2); depth_left drives line width and alpha.
+    """
+    # Frontier columns: x, y, length, angle, depth_left
+    frontier = np.array([[0.0, -2.0, 1.5, np.pi / 2, depth]])
+    for _ in range(depth):
+        if not len(frontier):
+            yield np.empty((0, 2, 2)), np.empty(0)
+            continue
+
+        x, y, length, angle, depth_left = frontier.T
+        x_end = x + length * np.cos(angle)
+        y_end = y + length * np.sin(angle)
+        segments = np.stack([np.column_stack([x, y]), np.column_stack([x_end, y_end])], axis=1)
+        yield segments, depth_left
+
+        grow = depth_left > 1
+        n = int(grow.sum())
+        x_end, y_end, angle, depth_left = x_end[grow], y_end[grow], angle[grow], depth_left[grow]
+        new_length = length[grow] * (0.6 + 0.1 * np.random.random(n))
+        variation = np.pi / 6 * (0.8 + 0.4 * np.random.random(n))
+        side = depth_left > 3
+
+        children = [
+            np.column_stack([x_end, y_end, new_length, angle + variation, depth_left - 1]),
+            np.column_stack([x_end, y_end, new_length, angle - variation, depth_left - 1]),
+            np.column_stack([x_end[side], y_end[side], new_length[side] * 0.7,
+                             angle[side] + variation[side] * 1.5, depth_left[side] - 2]),
+            np.column_stack([x_end[side], y_end[side], new_length[side] * 0.7,
+                             angle[side] - variation[side] * 1.5, depth_left[side] - 2])
+        ]
+        frontier = np.concatenate(children)
+
+def iter_sierpinski_levels(depth):
+    """Yield the filled triangles, shape (n, 3, 2), for levels 1..depth."""
+    triangles = np.array([[[0.0, 2.0], [-2.0, -2.0], [2.0, -2.0]]])
+    for _ in range(depth):
+        v0, v1, v2 = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+        m01, m12, m20 = (v0 + v1) / 2, (v1 + v2) / 2, (v2 + v0) / 2
+        triangles = np.concatenate([
+            np.stack([v0, m01, m20], axis=1),
+            np.stack([v1, m01, m12], axis=1),
+            np.stack([v2, m12, m20], axis=1)
+        ])
+        yield triangles
+
+def iter_circle_levels(depth):
+    """Yield (centers, radii) of the circles added at each level."""
+    centers, radii, depth_left = np.zeros((1, 2)), np.array([2.0]), depth
+    angles = np.array([0, 2 * np.pi / 3, 4 * np.pi / 3])
+    for _ in range(depth):
+        visible = radii >= 0.1
+        centers, radii = centers[visible], radii[visible]
+        if depth_left == 0 or not len(radii):
+            yield np.empty((0, 2)), np.empty(0)
+            continue
+        yield centers, radii
+
+        smaller = radii / 2.5
+        offsets = np.column_stack([np.cos(angles), np.sin(angles)])
+        centers = (centers[:, None, :] + (radii - smaller)[:, None, None] * offsets).reshape(-1, 2)
+        radii = np.repeat(smaller, len(angles))
+        depth_left -= 1
+
+_FERN_TRANSFORMS = np.array([
+    (0.0, 0.0, 0.0, 0.16, 0.0, 0.0),
+    (0.85, 0.04, -0.04, 0.85, 0.0, 1.6),
+    (0.2, -0.26, 0.23, 0.22, 0.0, 1.6),
+    (-0.15, 0.28, 0.26, 0.24, 0.0, 0.44)
+])
+_FERN_CUMULATIVE = np.cumsum([0.01, 0.85, 0.07, 0.07])
+
+def iter_fern_levels(depth, points_per_level=1000, max_points=5000):
+    """Yield the (n, 2) points added at each level of the chaos game."""
+    x, y, total = 0.0, 0.0, 0
+    for _ in range(depth):
+        n = max(0, min(points_per_level, max_points - total))
+        picks = np.minimum(np.searchsorted(_FERN_CUMULATIVE, np.random.random(n)), 3)
+        points = np.empty((n, 2))
+        # The chaos game is inherently sequential; only the draws are batched
+        for i, (a, b, c, d, e, f) in enumerate(_FERN_TRANSFORMS[picks]):
+            x, y = a * x + b * y + e, c * x + d * y + f
+            points[i] = (x, y)
+        total += n
+        yield points
+
+def iter_lsystem_polylines(name, depth):
+    """Yield the (n, 2) polyline of an unbranched L-system for levels 1..depth."""
+    for level in range(1, depth + 1):
+        yield lsystem_polyline(name, level)
+
+def iter_lsystem_levels(name, depth):
+    """Yield the (n, 2, 2) segments of an L-system for levels 1..depth."""
+    # Expansions are memoized in lsystem.expand, so each level only rewrites
+    # the previous level's string once; the turtle still runs per level
+    for level in range(1, depth + 1):
+        segments, _ = lsystem_segments(name, level)
+        yield segments
+
+# Curves defined only as L-systems (see lsystem.py)
+LSYSTEM_TYPES = ("hilbert", "gosper", "levy", "plant")
+DEPTH_LIMITS.update({name: LSYSTEMS[name].max_depth for name in LSYSTEM_TYPES})
+
+LEVEL_ITERATORS = {
+    "tree": iter_tree_levels,
+    # Snowflake and dragon come from the same L-systems as the static renderer
+    "snowflake": functools.partial(iter_lsystem_polylines, "snowflake"),
+    "sierpinski": iter_sierpinski_levels,
+    "dragon": functools.partial(iter_lsystem_polylines, "dragon"),
+    "fern": iter_fern_levels,
+    "circles": iter_circle_levels,
+    **{name: functools.partial(iter_lsystem_levels, name) for name in LSYSTEM_TYPES}
+}
+
+def iter_levels(fractal_type, depth):
+    depth = min(depth, DEPTH_LIMITS[fractal_type])
+    return LEVEL_ITERATORS[fractal_type](depth)
+
+def segment_bounds(segments, margin=0.05):
+    """Axis limits (xlim, ylim) around segments, padded by margin of the larger side."""
+    points = segments.reshape(-1, 2)
+    return _padded(points.min(axis=0), points.max(axis=0), margin)
+
+def _padded(lo, hi, margin):
+    pad = margin * max(hi[0] - lo[0], hi[1] - lo[1])
+    return (lo[0] - pad, hi[0] + pad), (lo[1] - pad, hi[1] + pad)
+
+@functools.lru_cache(maxsize=None)
+def _lsystem_extent(fractal_type, depth):
+    # Built from depth - 1, so each level is interpreted once per process.
+    # The L-system types have no jitter, so the extent never changes.
+    points = lsystem_segments(fractal_type, depth)[0].reshape(-1, 2)
+    lo, hi = points.min(axis=0), points.max(axis=0)
+    if depth > 1:
+        prev_lo, prev_hi = _lsystem_extent(fractal_type, depth - 1)
+        lo, hi = np.minimum(lo, prev_lo), np.maximum(hi, prev_hi)
+    return tuple(lo), tuple(hi)
+
+def lsystem_bounds(fractal_type, depth):
+    """Bounding box (xlim, ylim) covering every level 1..depth of an L-system curve.
+
+    Animations need this so that no frame is clipped; some curves (gosper)
+    extend further at lower levels than at the final one.
+    """
+    depth = min(depth, DEPTH_LIMITS[fractal_type])
+    lo, hi = _lsystem_extent(fractal_type, depth)
+    return _padded(lo, hi, 0.05)
+
+# Compact binary geometry for client-side (WebGL) rendering.
+#
+# Layout, little-endian:
+#   0  4s  magic b"FRGM"
+#   4  u8  format version (1)
+#   5  u8  primitive: 1 = line segments (vertex pairs), 2 = line strip, 3 = triangles
+#   6  u8  encoding: 0 = float32, 1 = int16 quantized to the bounding box
+#   7  u8  flags: bit 0 = int16 coordinates are delta-encoded per axis
+#   8  u32 vertex count
+#   12 4f  bounding box min_x, min_y, max_x, max_y
+#   28 u32 reserved
+#   32     vertex data, x/y interleaved
+#
+# Quantized values map [min, max] onto [-32768, 32767]. Deltas wrap modulo
+# 2**16, so the client must accumulate them in int16 arithmetic.
+
+GEOMETRY_MAGIC = b"FRGM"
+GEOMETRY_VERSION = 1
+GEOMETRY_HEADER = struct.Struct("<4sBBBBI4fI")
+
+PRIMITIVE_LINES = 1
+PRIMITIVE_LINE_STRIP = 2
+PRIMITIVE_TRIANGLES = 3
+
+ENCODING_FLOAT32 = 0
+ENCODING_INT16 = 1
+FLAG_DELTA = 0x01
+
+GEOMETRY_TYPES = ("tree", "snowflake", "sierpinski", "dragon") + LSYSTEM_TYPES
+
+def build_geometry(fractal_type, depth):
+    """Return (primitive, vertices) for the final level, vertices shape (n, 2)."""
+    levels = iter_levels(fractal_type, depth)
+
+    if fractal_type == "tree":
+        segments = [level_segments for level_segments, _ in levels]
+        return PRIMITIVE_LINES, np.concatenate(segments).reshape(-1, 2)
+    if fractal_type == "sierpinski":
+        return PRIMITIVE_TRIANGLES, _last(levels).reshape(-1, 2)
+    if fractal_type in ("snowflake", "dragon") + LSYSTEM_TYPES:
+        # Only the final level is needed, so skip the per-level iterator
+        system = LSYSTEMS[fractal_type]
+        depth = min(depth, system.max_depth)
+        # Unbranched curves are sent as a strip, half the size of segment pairs
+        if "[" not in system.axiom + "".join(system.rules.values()):
+            return PRIMITIVE_LINE_STRIP, lsystem_polyline(fractal_type, depth)
+        segments, _ = lsystem_segments(fractal_type, depth)
+        return PRIMITIVE_LINES, segments.reshape(-1, 2)
+    raise ValueError(f"No vector geometry for fractal type {fractal_type!r}")
+
+def _last(levels):
+    result = None
+    for result in levels:
+        pass
+    return result
+
+def encode_geometry(primitive, vertices, quantize=False, delta=False):
+    if delta and not quantize:
+        raise ValueError("Delta encoding requires int16 quantization")
+
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 2)
+    if len(vertices):
+        lo, hi = vertices.min(axis=0), vertices.max(axis=0)
+    else:
+        lo, hi = np.zeros(2), np.zeros(2)
+
+    if quantize:
+        span = np.where(hi > lo, hi - lo, 1.0)
+        data = (np.rint((vertices - lo) / span * 65535) - 32768).astype("<i2")
+        if delta and len(data):
+            data[1:] = np.diff(data, axis=0)    # int16 overflow wraps by design
+        encoding = ENCODING_INT16
+    else:
+        data = vertices.astype("<f4")
+        encoding = ENCODING_FLOAT32
+
+    header = GEOMETRY_HEADER.pack(
+        GEOMETRY_MAGIC, GEOMETRY_VERSION, primitive, encoding,
+        FLAG_DELTA if delta else 0, len(data), lo[0], lo[1], hi[0], hi[1], 0
+    )
+    return header + data.tobytes()
@@ -0,0 +1,33 @@
+import os, time, uuid
+
+# Time-ordered fractal IDs (UUIDv7 layout, RFC 9562).
+# The first 48 bits are the Unix timestamp in milliseconds, so the canonical
+# lowercase hex string sorts lexicographically in creation order. That lets
+# DynamoDB return a user's newest fractals first with ScanIndexForward=False.
+
+def new_fractal_id(timestamp_ms=None):
+    if timestamp_ms is None:
+        timestamp_ms = time.time_ns() // 1_000_000
+
+    rand = int.from_bytes(os.urandom(10), "big")
+    value = (int(timestamp_ms) & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76                           # version 7
+    value |= ((rand >> 62) & 0xFFF) << 64        # rand_a (12 bits)
+    value |= 0b10 << 62                          # RFC 4122 variant
+    value |= rand & 0x3FFFFFFFFFFFFFFF           # rand_b (62 bits)
+    return str(uuid.UUID(int=value))
+
+def is_time_ordered_id(fractal_id):
+    try:
+        return uuid.UUID(fractal_id).version == 7
+    except (ValueError, TypeError, AttributeError):
+        return False
+
+# Request idempotency markers share the fractals table (see claim_request in
+# fractal_service.py) under their own partition; they are not fractals.
+IDEMPOTENCY_PARTITION_PREFIX = "request#"
+IDEMPOTENCY_SORT_KEY = "request"
+
+def is_idempotency_marker(item):
+    return item["Username"].startswith(IDEMPOTENCY_PARTITION_PREFIX) or \
+        item["FractalId"] == IDEMPOTENCY_SORT_KEY
@@ -1,10 +1,17 @@
-import os, io, uuid, boto3, base64, time
-from fastapi import FastAPI, HTTPException, Form
+import os, io, boto3, base64, time, tempfile
+from fastapi import FastAPI, HTTPException, Form, Request
+from fastapi.responses import StreamingResponse
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.collections import LineCollection
 import asyncio
 import json
+from fractal_ids import new_fractal_id, IDEMPOTENCY_PARTITION_PREFIX, IDEMPOTENCY_SORT_KEY
+from fractal_animation import iter_animation_gif
+from fractal_geometry import LSYSTEM_TYPES, segment_bounds
+from lsystem import LSYSTEMS, lsystem_polyline, lsystem_segments
+from profiling import ProfilingMiddleware, token_authorizer, s3_store, local_store, tag_profile
 
 app = FastAPI(title="Fractal Generation Service")
 
@@ -47,6 +54,102 @@ except Exception as e:
     s3, dynamo = None, None
     AWS_AVAILABLE = False
 
+# === Request profiling ===
+# /generate is profiled when the gateway forwards an admin's X-Profile
+# request with the shared profiling token, or every Nth request when
+# profile-sample-every is set. An empty token disables on-demand profiling.
+PROFILING_TOKEN = get_parameter('/fractal-app/profiling-token')
+PROFILE_SAMPLE_EVERY = int(get_parameter('/fractal-app/profile-sample-every') or 0)
+app.add_middleware(
+    ProfilingMiddleware,
+    paths={"/generate"},
+    authorize=token_authorizer(PROFILING_TOKEN),
+    store=s3_store(s3, S3_BUCKET) if AWS_AVAILABLE else local_store(os.path.join(tempfile.gettempdir(), "fractal-profiles")),
+    sample_every=PROFILE_SAMPLE_EVERY
+)
+
+# === Request idempotency ===
+# SQS may deliver a message more than once and clients may retry, so each
+# request carries a deterministic request_id. Before rendering, the worker
+# claims it with a conditional put of a marker item in the fractals table.
+# Markers live in their own "request#<id>" partition, so they never show up
+# in a user's /fractals/list query, and expire via the table's TTL on
+# ExpiresAt, which ensure_idempotency_ttl turns on at startup.
+IDEMPOTENCY_TTL_SECONDS = 86400
+CLAIM_TIMEOUT_SECONDS = 300  # matches the SQS visibility timeout
+IDEMPOTENCY_TTL_ATTRIBUTE = "ExpiresAt"
+
+class RequestInProgress(Exception):
+    pass
+
+def ensure_idempotency_ttl():
+    client = dynamo.meta.client
+    try:
+        ttl = client.describe_time_to_live(TableName=DYNAMO_TABLE)["TimeToLiveDescription"]
+        if ttl.get("TimeToLiveStatus") in ("ENABLED", "ENABLING"):
+            return
+        client.update_time_to_live(
+            TableName=DYNAMO_TABLE,
+            TimeToLiveSpecification={"Enabled": True, "AttributeName": IDEMPOTENCY_TTL_ATTRIBUTE}
+        )
+        print(f"✅ Fractal Service: Enabled TTL on {IDEMPOTENCY_TTL_ATTRIBUTE}")
+    except Exception as e:
+        # Without TTL markers are never removed; enable it on the table by hand
+        print(f"⚠️ Fractal Service: Could not enable TTL on {DYNAMO_TABLE}.{IDEMPOTENCY_TTL_ATTRIBUTE}: {e}")
+
+def idempotency_key(request_id):
+    return {"Username": f"{IDEMPOTENCY_PARTITION_PREFIX}{request_id}", "FractalId": IDEMPOTENCY_SORT_KEY}
+
+def claim_request(request_id, username):
+    """Claim request_id for rendering. Returns the stored marker if it already completed."""
+    now = int(time.time())
+    try:
+        dynamo.put_item(
+            Item={
+                **idempotency_key(request_id),
+                "Owner": username,
+                "RequestStatus": "pending",
+                "ClaimedAt": now,
+                IDEMPOTENCY_TTL_ATTRIBUTE: now + IDEMPOTENCY_TTL_SECONDS
+            },
+            # A pending claim older than the visibility timeout was abandoned
+            ConditionExpression="attribute_not_exists(Username) OR "
+                                "(RequestStatus = :pending AND ClaimedAt < :stale)",
+            ExpressionAttributeValues={":pending": "pending", ":stale": now - CLAIM_TIMEOUT_SECONDS}
+        )
+        return None
+    except dynamo.meta.client.exceptions.ConditionalCheckFailedException:
+        marker = dynamo.get_item(Key=idempotency_key(request_id), ConsistentRead=True).get("Item")
+        if marker and marker.get("RequestStatus") == "done":
+            return marker
+        raise RequestInProgress(request_id)
+
+def complete_request(request_id, fractal_id, s3_key, fractal_name, depth, color):
+    result = {
+        "RequestStatus": "done",
+        "ResultFractalId": fractal_id,
+        "S3Key": s3_key,
+        "FractalType": fractal_name,
+        "Depth": depth,
+        "Color": color
+    }
+    # Attribute name placeholders sidestep DynamoDB reserved words
+    dynamo.update_item(
+        Key=idempotency_key(request_id),
+        UpdateExpression="SET " + ", ".join(f"#a{i} = :v{i}" for i in range(len(result))),
+        ExpressionAttributeNames={f"#a{i}": name for i, name in enumerate(result)},
+        ExpressionAttributeValues={f":v{i}": value for i, value in enumerate(result.values())}
+    )
+
+def release_request(request_id):
+    try:
+        dynamo.delete_item(Key=idempotency_key(request_id))
+    except Exception as e:
+        print(f"⚠️ Fractal Service: Could not release request {request_id}: {e}")
+
+if AWS_AVAILABLE:
+    ensure_idempotency_ttl()
+
 # Import fractal generation functions from your existing code
 def create_color_map(base_color):
     color_maps = {
@@ -91,37 +194,8 @@ def generate_tree_fractal(depth, color, ax):
     ax.set_ylim(-2, 6)
 
 def generate_koch_snowflake(depth, color, ax):
-    def koch_curve(start, end, depth):
-        if depth == 0:
-            return [start, end]
-        
-        diff = end - start
-        p1 = start + diff / 3
-        p3 = start + 2 * diff / 3
-        
-        angle = np.pi / 3
-        rot = np.array([[np.cos(angle), -np.sin(angle)], 
-                       [np.sin(angle), np.cos(angle)]])
-        p2 = p1 + rot @ (diff / 3)
-        
-        return (koch_curve(start, p1, depth-1) + 
-                koch_curve(p1, p2, depth-1) + 
-                koch_curve(p2, p3, depth-1) + 
-                koch_curve(p3, end, depth-1))
-    
-    size = 2
-    points = [
-        np.array([0, size * np.sqrt(3)/3]),
-        np.array([-size/2, -size * np.sqrt(3)/6]),
-        np.array([size/2, -size * np.sqrt(3)/6])
-    ]
-    
-    all_points = []
-    for i in range(3):
-        curve = koch_curve(points[i], points[(i+1)%3], depth)
-        all_points.extend(curve)
-    
-    points_array = np.array(all_points)
+    # F++F++F with F -> F+F--F+F; same outline as the old recursive koch_curve
+    points_array = lsystem_polyline("snowflake", depth)
     ax.plot(points_array[:, 0], points_array[:, 1], color=color, linewidth=2)
     ax.set_aspect('equal')
     ax.set_xlim(-3, 3)
@@ -150,22 +224,8 @@ def generate_sierpinski_triangle(depth, color, ax):
     ax.set_ylim(-2.5, 2.5)
 
 def generate_dragon_curve(depth, color, ax):
-    def dragon_curve(start, end, depth, direction=1):
-        if depth == 0:
-            return [start, end]
-        
-        diff = end - start
-        perpendicular = np.array([-diff[1], diff[0]]) * direction
-        mid = (start + end) / 2 + perpendicular / 2
-        
-        return (dragon_curve(start, mid, depth-1, 1) +
-                dragon_curve(mid, end, depth-1, -1))
-    
-    start = np.array([-2, 0])
-    end = np.array([2, 0])
-    points = dragon_curve(start, end, depth)
-    
-    points_array = np.array(points)
+    # F -> +F--G+, G -> -F++G-; same path as the old recursive dragon_curve
+    points_array = lsystem_polyline("dragon", depth)
     ax.plot(points_array[:, 0], points_array[:, 1], color=color, linewidth=1.5)
     ax.set_aspect('equal')
     ax.set_xlim(-3, 3)
@@ -224,24 +284,72 @@ def generate_circle_packing(depth, color, ax):
     ax.set_xlim(-3, 3)
     ax.set_ylim(-3, 3)
 
+def generate_lsystem_fractal(fractal_type, depth, color, ax):
+    segments, _ = lsystem_segments(fractal_type, depth)
+    ax.add_collection(LineCollection(segments, colors=color, linewidths=1))
+    xlim, ylim = segment_bounds(segments)
+    ax.set_aspect('equal')
+    ax.set_xlim(*xlim)
+    ax.set_ylim(*ylim)
+
+VALID_COLORS = ["blue", "red", "green", "purple", "orange", "darkblue", "black"]
+VALID_TYPES = ["tree", "snowflake", "sierpinski", "dragon", "fern", "circles", *LSYSTEM_TYPES]
+FRACTAL_NAMES = {
+    "tree": "Recursive Tree",
+    "snowflake": "Koch Snowflake",
+    "sierpinski": "Sierpinski Triangle",
+    "dragon": "Dragon Curve",
+    "fern": "Barnsley Fern",
+    "circles": "Circle Packing",
+    **{name: LSYSTEMS[name].name for name in LSYSTEM_TYPES}
+}
+
 @app.post("/generate")
 async def generate_fractal(
+    request: Request,
     depth: int = Form(..., ge=1, le=8),
     color: str = Form("blue"),
     fractal_type: str = Form("tree"),
-    username: str = Form(...)
+    username: str = Form(...),
+    request_id: str = Form(None)
 ):
     print(f"🎨 Fractal Service: Generating {fractal_type} fractal for {username}")
     
     # Validate inputs
-    valid_colors = ["blue", "red", "green", "purple", "orange", "darkblue", "black"]
-    if color not in valid_colors:
+    if color not in VALID_COLORS:
         color = "blue"
     
-    valid_types = ["tree", "snowflake", "sierpinski", "dragon", "fern", "circles"]
-    if fractal_type not in valid_types:
+    if fractal_type not in VALID_TYPES:
         fractal_type = "tree"
 
+    tag_profile(request, fractal_type=fractal_type, depth=depth, color=color, username=username)
+
+    # Skip the render entirely for a request that was already handled
+    if AWS_AVAILABLE and request_id:
+        try:
+            marker = claim_request(request_id, username)
+        except RequestInProgress:
+            raise HTTPException(409, "Fractal generation for this request is already in progress")
+        except Exception as e:
+            raise HTTPException(500, f"Error claiming fractal request: {str(e)}")
+        if marker:
+            print(f"♻️ Fractal Service: Duplicate request {request_id}, returning stored result")
+            return {
+                "message": f"{marker['FractalType']} already generated for this request",
+                "id": marker["ResultFractalId"],
+                "depth": int(marker["Depth"]),
+                "color": marker["Color"],
+                "fractal_type": marker["FractalType"],
+                "saved_to_cloud": True,
+                "duplicate": True,
+                "image_url": s3.generate_presigned_url(
+                    'get_object',
+                    Params={'Bucket': S3_BUCKET, 'Key': marker["S3Key"]},
+                    ExpiresIn=3600
+                )
+            }
+
+    saved = False
     try:
         # Create figure with high quality
         plt.style.use('dark_background')
@@ -251,16 +359,7 @@ async def generate_fractal(
         ax.set_facecolor('black')
 
         # Generate selected fractal type
-        fractal_names = {
-            "tree": "Recursive Tree",
-            "snowflake": "Koch Snowflake", 
-            "sierpinski": "Sierpinski Triangle",
-            "dragon": "Dragon Curve",
-            "fern": "Barnsley Fern",
-            "circles": "Circle Packing"
-        }
-        
-        fractal_name = fractal_names.get(fractal_type, "Recursive Tree")
+        fractal_name = FRACTAL_NAMES.get(fractal_type, "Recursive Tree")
         
         if fractal_type == "tree":
             generate_tree_fractal(depth, color, ax)
@@ -274,6 +373,8 @@ async def generate_fractal(
             generate_fern_fractal(depth, color, ax)
         elif fractal_type == "circles":
             generate_circle_packing(min(depth, 6), color, ax)
+        elif fractal_type in LSYSTEM_TYPES:
+            generate_lsystem_fractal(fractal_type, depth, color, ax)
         
         ax.set_title(f'{fractal_name} (Depth: {depth})', color='white', pad=20, fontsize=14)
         plt.tight_layout()
@@ -285,7 +386,9 @@ async def generate_fractal(
         buf.seek(0)
         plt.close(fig)
 
-        fractal_id = str(uuid.uuid4())
+        # Time-ordered ID so the DynamoDB sort key is newest-first when reversed
+        created_at_ms = time.time_ns() // 1_000_000
+        fractal_id = new_fractal_id(created_at_ms)
         
         if AWS_AVAILABLE:
             # Save to S3
@@ -307,8 +410,18 @@ async def generate_fractal(
                 "Color": color,
                 "FractalType": fractal_name,
                 "S3Key": s3_key,
-                "CreatedAt": str(int(time.time()))
+                "CreatedAt": created_at_ms // 1000
             })
+            saved = True
+
+            if request_id:
+                try:
+                    complete_request(request_id, fractal_id, s3_key, fractal_name, depth, color)
+                except Exception as e:
+                    # The fractal is stored, so this request succeeded. The claim
+                    # stays pending, which still turns away redeliveries until
+                    # it goes stale.
+                    print(f"⚠️ Fractal Service: Could not complete request {request_id}: {e}")
             
             return {
                 "message": f"{fractal_name} generated and saved to cloud!",
@@ -333,8 +446,34 @@ async def generate_fractal(
             }
 
     except Exception as e:
+        # Only an unsaved render may be retried; releasing after the save
+        # would let a redelivery store the fractal twice
+        if AWS_AVAILABLE and request_id and not saved:
+            release_request(request_id)
         raise HTTPException(500, f"Error generating fractal: {str(e)}")
 
+@app.post("/generate/animation")
+def generate_animation(
+    depth: int = Form(..., ge=1, le=8),
+    color: str = Form("blue"),
+    fractal_type: str = Form("tree"),
+    username: str = Form(...)
+):
+    print(f"🎞️ Fractal Service: Animating {fractal_type} depth 1-{depth} for {username}")
+
+    if color not in VALID_COLORS:
+        color = "blue"
+    if fractal_type not in VALID_TYPES:
+        fractal_type = "tree"
+
+    # Frames are rendered lazily while the response is being sent, so the
+    # GIF is streamed in chunks and never held in memory as a whole
+    return StreamingResponse(
+        iter_animation_gif(fractal_type, depth, color, FRACTAL_NAMES[fractal_type]),
+        media_type="image/gif",
+        headers={"Cache-Control": "no-store"}
+    )
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "fractal_generation"}
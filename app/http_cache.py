@@ -0,0 +1,77 @@
+import gzip, hashlib
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Conditional GET helpers for pages rendered from in-memory templates.
+# ETags are content hashes, so a client that already has the page gets an
+# empty 304 instead of the body. They are weak (W/) because
+# CompressionMiddleware serves the same page as identity, gzip or br bytes,
+# and a strong validator would have to differ per content-coding.
+#
+# Fully static pages are compressed once with precompress() and served with
+# the best variant the client accepts; CompressionMiddleware leaves
+# responses that already carry a Content-Encoding alone.
+
+# Most preferred first
+PRECOMPRESSED_ENCODINGS = ("br", "gzip")
+
+def make_etag(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return f'W/"{digest.hexdigest()[:32]}"'
+
+def _opaque_tag(tag):
+    # If-None-Match uses weak comparison: W/"x" and "x" match
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return _opaque_tag(etag) in (_opaque_tag(tag) for tag in header.split(","))
+
+def precompress(body: bytes, brotli_quality: int = 11) -> dict:
+    """Compressed variants of a static body, keyed by content-coding."""
+    variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=brotli_quality)
+    return variants
+
+def accepted_encodings(request: Request) -> set:
+    accepted = set()
+    for item in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = item.partition(";")
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+def cached_response(request: Request, body: bytes, etag: str, cache_control: str,
+                    media_type: str = "text/html; charset=utf-8", variants: dict = None) -> Response:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if variants:
+        headers["Vary"] = "Accept-Encoding"
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if variants:
+        accepted = accepted_encodings(request)
+        for coding in PRECOMPRESSED_ENCODINGS:
+            if coding in variants and coding in accepted:
+                return Response(content=variants[coding], media_type=media_type,
+                                headers={**headers, "Content-Encoding": coding})
+    return Response(content=body, media_type=media_type, headers=headers)
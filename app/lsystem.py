@@ -0,0 +1,150 @@
+import functools
+import numpy as np
+
+# Generic L-system engine.
+#
+# Rewriting uses str.translate, which applies all production rules in one
+# C-level pass, and each expansion is memoized so depth N is built from the
+# cached depth N-1 string.
+#
+# The turtle is interpreted without a Python loop over symbols:
+#   headings  = start heading + cumsum(turn deltas)
+#   positions = start + cumsum(step * unit vector(heading))
+# Branching ("[" push, "]" pop) is handled by giving each "]" a correction
+# that cancels everything its branch added. Turns and steps nested deeper
+# inside the branch are already cancelled by their own "]", so the
+# correction only needs the sum of the branch's own nesting level. That is
+# a difference of per-level cumulative sums, taken after one stable sort of
+# the symbols by nesting level.
+#
+# Symbols: draw symbols move forward drawing a segment, "f" moves without
+# drawing, "+"/"-" turn left/right, "[" / "]" push/pop the turtle state.
+# Any other symbol (X, Y, A, B, ...) only takes part in rewriting.
+
+class LSystem:
+    def __init__(self, name, axiom, rules, angle, draw="F", start=(0.0, 0.0), heading=90.0,
+                 length=1.0, length_scale=1.0, branch_scale=1.0, angle_jitter=0.0,
+                 length_jitter=0.0, max_depth=8):
+        self.name = name
+        self.axiom = axiom
+        self.rules = rules
+        self.angle = angle                  # degrees per "+" / "-"
+        self.draw = draw
+        self.start = start
+        self.heading = heading              # initial heading in degrees
+        self.length = length                # step length at depth 0
+        self.length_scale = length_scale    # step multiplier per rewriting depth
+        self.branch_scale = branch_scale    # step multiplier per nesting level
+        self.angle_jitter = angle_jitter    # relative random variation of turns
+        self.length_jitter = length_jitter  # relative random variation of steps
+        self.max_depth = max_depth
+        self.table = str.maketrans(rules)
+
+LSYSTEMS = {
+    # Re-expressions of the original recursive generators. The recursive
+    # tree stays as it is: its side branches depend on the remaining depth,
+    # which a context-free L-system cannot express.
+    "snowflake": LSystem("Koch Snowflake", "F++F++F", {"F": "F+F--F+F"}, 60,
+                         start=(0.0, 2 * np.sqrt(3) / 3), heading=240, length=2.0,
+                         length_scale=1 / 3, max_depth=6),
+    "dragon": LSystem("Dragon Curve", "F", {"F": "+F--G+", "G": "-F++G-"}, 45, draw="FG",
+                      start=(-2.0, 0.0), heading=0, length=4.0, length_scale=1 / np.sqrt(2),
+                      max_depth=15),
+    # Curves that previously had no generator
+    "hilbert": LSystem("Hilbert Curve", "A", {"A": "+BF-AFA-FB+", "B": "-AF+BFB+FA-"}, 90,
+                       start=(-2.0, -2.0), heading=0, length=4.0, length_scale=0.5),
+    "gosper": LSystem("Gosper Curve", "A", {"A": "A-B--B+A++AA+B-", "B": "+A-BB--B-A++A+B"}, 60,
+                      draw="AB", heading=0, length=3.0, length_scale=1 / np.sqrt(7), max_depth=5),
+    "levy": LSystem("Lévy C Curve", "F", {"F": "+F--F+"}, 45, start=(-1.5, -1.0), heading=0,
+                    length=3.0, length_scale=1 / np.sqrt(2), max_depth=15),
+    "plant": LSystem("Fractal Plant", "X", {"X": "F+[[X]-X]-F[-X]+X", "F": "FF"}, 25,
+                     start=(0.0, -3.0), heading=65, length=6.0, length_scale=0.5, max_depth=6)
+}
+
+@functools.lru_cache(maxsize=64)
+def expand(name, depth):
+    """Return the symbol string of LSYSTEMS[name] after depth rewriting steps."""
+    if depth <= 0:
+        return LSYSTEMS[name].axiom
+    return expand(name, depth - 1).translate(LSYSTEMS[name].table)
+
+def _branch_structure(nesting, push, pop):
+    """Precompute what _restore_on_pop needs: a level-major order and bracket pairs."""
+    # A stable sort by nesting level lines up each level's elements in
+    # string order, so one cumsum gives every per-level running sum.
+    order = np.argsort(nesting, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+
+    # Branches at one level never interleave: the k-th "[" opening level L
+    # is closed by the k-th "]" returning to level L-1
+    opens, closes = np.flatnonzero(push), np.flatnonzero(pop)
+    opens = opens[np.argsort(nesting[opens], kind="stable")]
+    closes = closes[np.argsort(nesting[closes], kind="stable")]
+    if len(opens) != len(closes):
+        raise ValueError("Unbalanced brackets in L-system string")
+    return order, rank, opens, closes
+
+def _restore_on_pop(values, branches):
+    """Add to each "]" the value that undoes its branch's net contribution."""
+    order, rank, opens, closes = branches
+    if not len(closes):
+        return values
+    level_sum = np.cumsum(values[order], axis=0)
+    values = values.copy()
+    # The symbol just before a "]" is always at the branch's own level
+    values[closes] -= level_sum[rank[closes - 1]] - level_sum[rank[opens]]
+    return values
+
+def interpret(system, symbols, depth=0):
+    """Run the turtle over symbols and return (segments, nesting).
+
+    segments has shape (n, 2, 2); nesting is the branch depth of each
+    segment, which callers can use for line width.
+    """
+    codes = np.frombuffer(symbols.encode("ascii"), dtype=np.uint8)
+    draw_codes = np.frombuffer(system.draw.encode("ascii"), dtype=np.uint8)
+    # Symbols that only drive rewriting (X, A, ...) do nothing to the turtle
+    codes = codes[np.isin(codes, np.concatenate([draw_codes, np.frombuffer(b"f+-[]", dtype=np.uint8)]))]
+
+    push = codes == ord("[")
+    pop = codes == ord("]")
+    draw = np.isin(codes, draw_codes)
+    moves = np.flatnonzero(draw | (codes == ord("f")))
+    nesting = np.cumsum(push) - np.cumsum(pop)
+    branches = _branch_structure(nesting, push, pop)
+
+    turns = np.zeros(len(codes))
+    turning = np.flatnonzero((codes == ord("+")) | (codes == ord("-")))
+    turns[turning] = np.where(codes[turning] == ord("+"), 1.0, -1.0) * np.radians(system.angle)
+    if system.angle_jitter:
+        turns[turning] *= 1 + system.angle_jitter * np.random.uniform(-1, 1, len(turning))
+    headings = np.radians(system.heading) + np.cumsum(_restore_on_pop(turns, branches))
+
+    # Trig and step lengths are only needed where the turtle moves
+    lengths = system.length * system.length_scale ** depth * system.branch_scale ** nesting[moves]
+    if system.length_jitter:
+        lengths = lengths * (1 + system.length_jitter * np.random.uniform(-1, 1, len(moves)))
+    steps = np.zeros((len(codes), 2))
+    steps[moves, 0] = lengths * np.cos(headings[moves])
+    steps[moves, 1] = lengths * np.sin(headings[moves])
+    positions = np.asarray(system.start) + np.cumsum(_restore_on_pop(steps, branches), axis=0)
+
+    previous = np.vstack([system.start, positions[:-1]])
+    segments = np.stack([previous[draw], positions[draw]], axis=1)
+    return segments, nesting[draw]
+
+def polyline(system, symbols, depth=0):
+    """Vertices of an unbranched curve: the start point then every step end."""
+    segments, _ = interpret(system, symbols, depth)
+    return np.vstack([segments[:1, 0], segments[:, 1]])
+
+def lsystem_segments(name, depth):
+    system = LSYSTEMS[name]
+    depth = min(depth, system.max_depth)
+    return interpret(system, expand(name, depth), depth)
+
+def lsystem_polyline(name, depth):
+    system = LSYSTEMS[name]
+    depth = min(depth, system.max_depth)
+    return polyline(system, expand(name, depth), depth)
@@ -1,13 +1,26 @@
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-import os
+import os, boto3
+from compression import CompressionMiddleware
+from profiling import ProfilingMiddleware, s3_store
+from auth import is_admin_request, get_parameter
 
 # Import routers correctly
 from routes_auth import router as auth_router
 from routes_core import router as core_router
-from routes_fractals_updated import router as fractal_router  # Updated import
+from routes_fractals import router as fractal_router
 
 app = FastAPI()
+app.add_middleware(CompressionMiddleware)
+# Admins can profile a generate request with X-Profile: 1 or ?profile=1;
+# profile-sample-every > 0 also profiles every Nth request
+app.add_middleware(
+    ProfilingMiddleware,
+    paths={"/fractals/generate"},
+    authorize=is_admin_request,
+    store=s3_store(boto3.client('s3', region_name='ap-southeast-2'), 'n11608676-asses2'),
+    sample_every=int(get_parameter('/fractal-app/profile-sample-every') or 0)
+)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 static_dir = os.path.join(BASE_DIR, "static")
@@ -0,0 +1,98 @@
+"""Rewrite existing fractal items to time-ordered IDs and numeric timestamps.
+
+Older items use random uuid4 FractalIds and a string CreatedAt, so a reverse
+query on the table returns them in random order. FractalId is the sort key and
+cannot be updated in place: each legacy item is copied to a new UUIDv7 key
+derived from its CreatedAt and the old item is deleted, in batches of 25.
+
+Usage:
+    python migrate_fractal_ids.py --dry-run
+    python migrate_fractal_ids.py --table n11608676-FractalsTable
+"""
+import argparse, time
+import boto3
+from fractal_ids import new_fractal_id, is_time_ordered_id, is_idempotency_marker
+
+DEFAULT_REGION = "ap-southeast-2"
+DEFAULT_TABLE = "n11608676-FractalsTable"
+
+def migrate_item(item):
+    """Return the rewritten copy of a legacy item, or None if it needs no change."""
+    if is_idempotency_marker(item):
+        # Markers are keyed by request, not by creation time
+        return None
+    created_at = item.get("CreatedAt")
+    needs_new_id = not is_time_ordered_id(item["FractalId"])
+    needs_numeric_ts = isinstance(created_at, str)
+    if not needs_new_id and not needs_numeric_ts:
+        return None
+
+    try:
+        created_at = int(created_at)
+    except (TypeError, ValueError):
+        created_at = int(time.time())
+
+    new_item = dict(item)
+    new_item["CreatedAt"] = created_at
+    if needs_new_id:
+        # S3Key is left untouched: it still points at the original object
+        new_item["FractalId"] = new_fractal_id(created_at * 1000)
+        new_item["LegacyFractalId"] = item["FractalId"]
+    return new_item
+
+def scan_items(table, page_size):
+    kwargs = {"Limit": page_size}
+    while True:
+        resp = table.scan(**kwargs)
+        yield resp.get("Items", [])
+        if "LastEvaluatedKey" not in resp:
+            return
+        kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+def migrate(table, page_size=100, dry_run=False):
+    scanned = rewritten = 0
+    for page in scan_items(table, page_size):
+        rewrites = []
+        for item in page:
+            scanned += 1
+            new_item = migrate_item(item)
+            if new_item is not None:
+                rewrites.append((item, new_item))
+
+        if dry_run or not rewrites:
+            rewritten += len(rewrites)
+            continue
+
+        # batch_writer groups puts/deletes into BatchWriteItem calls of 25
+        # and retries unprocessed items. Put the new copy before deleting the
+        # old key so an interrupted run never loses an item.
+        with table.batch_writer() as batch:
+            for old_item, new_item in rewrites:
+                batch.put_item(Item=new_item)
+        with table.batch_writer() as batch:
+            for old_item, new_item in rewrites:
+                if new_item["FractalId"] != old_item["FractalId"]:
+                    batch.delete_item(Key={
+                        "Username": old_item["Username"],
+                        "FractalId": old_item["FractalId"]
+                    })
+        rewritten += len(rewrites)
+        print(f"🔁 Migrated {rewritten} of {scanned} items so far")
+
+    return scanned, rewritten
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--table", default=DEFAULT_TABLE)
+    parser.add_argument("--region", default=DEFAULT_REGION)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    table = boto3.resource("dynamodb", region_name=args.region).Table(args.table)
+    scanned, rewritten = migrate(table, args.page_size, args.dry_run)
+    action = "Would migrate" if args.dry_run else "Migrated"
+    print(f"✅ {action} {rewritten} of {scanned} items in {args.table}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import os, sys, time, uuid, html, zlib, hmac, asyncio, threading, itertools
+from collections import Counter
+from urllib.parse import parse_qs, quote
+from starlette.datastructures import Headers
+
+# Opt-in request profiling with collapsed-stack and flamegraph output.
+#
+# A profiled request is sampled by a background thread that reads the
+# handler thread's Python stack every few milliseconds. The samples are
+# written in the collapsed-stack format ("outer;inner;leaf count", as read
+# by flamegraph.pl and speedscope) plus a self-contained SVG flamegraph.
+#
+# A request is profiled when an authorized caller asks for it (X-Profile: 1
+# header or ?profile=1) or when it is the Nth request in sampled mode.
+# Otherwise the middleware does a path lookup and a header check.
+#
+# Profiles are stored as <prefix><profile id>.collapsed and .svg, and the
+# id is returned in the X-Profile-Id response header. Rendering and upload
+# happen in a worker thread after the response, so they add no latency to
+# the profiled request or to others on the same event loop.
+
+SAMPLE_INTERVAL_SECONDS = 0.002
+
+class StackSampler:
+    """Sample one thread's Python stack until stopped."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.counts
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+def collapsed_stacks(counts):
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+def render_flamegraph(counts, title, width=1200, row_height=16):
+    """Render sampled stacks as a standalone SVG flamegraph."""
+    root = {"value": 0, "children": {}}
+    for stack, count in counts.items():
+        node = root
+        node["value"] += count
+        for name in stack.split(";"):
+            node = node["children"].setdefault(name, {"value": 0, "children": {}})
+            node["value"] += count
+
+    rects = []
+    def layout(name, node, x, depth):
+        rects.append((name, node["value"], x, depth))
+        child_x = x
+        for child_name, child in sorted(node["children"].items()):
+            layout(child_name, child, child_x, depth + 1)
+            child_x += child["value"]
+    layout("all", root, 0, 0)
+
+    total = max(root["value"], 1)
+    max_depth = max(depth for _, _, _, depth in rects)
+    height = (max_depth + 1) * row_height + 40
+    scale = (width - 20) / total
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="Verdana" font-size="11">',
+        f'<rect width="100%" height="100%" fill="#f8f8f8"/>',
+        f'<text x="10" y="20" font-size="14">{html.escape(title)} ({root["value"]} samples)</text>'
+    ]
+    for name, value, x, depth in rects:
+        w = value * scale
+        if w < 0.5:
+            continue
+        y = height - (depth + 1) * row_height
+        # Stable warm colour per frame name
+        hue = zlib.crc32(name.encode("utf-8"))
+        fill = f"rgb({205 + hue % 50},{80 + (hue >> 8) % 130},{40 + (hue >> 16) % 40})"
+        label = html.escape(name)
+        parts.append(
+            f'<g><title>{label} ({value} samples, {100 * value / total:.1f}%)</title>'
+            f'<rect x="{10 + x * scale:.1f}" y="{y}" width="{w:.1f}" height="{row_height - 1}" fill="{fill}"/>'
+        )
+        if w > 40:
+            visible = label[:int(w / 7)]
+            parts.append(f'<text x="{12 + x * scale:.1f}" y="{y + row_height - 4}">{visible}</text>')
+        parts.append('</g>')
+    parts.append('</svg>')
+    return "\n".join(parts)
+
+def local_store(directory):
+    """Profile store that writes files under directory."""
+    def store(name, collapsed, svg, tags):
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, name)
+        with open(base + ".collapsed", "w", encoding="utf-8") as f:
+            f.write(collapsed)
+        with open(base + ".svg", "w", encoding="utf-8") as f:
+            f.write(svg)
+    return store
+
+def s3_store(s3, bucket, prefix="profiles/"):
+    """Profile store that uploads to S3, with the request parameters as metadata."""
+    def store(name, collapsed, svg, tags):
+        # S3 metadata must be ASCII; values such as usernames are percent-encoded
+        metadata = {key.replace("_", "-"): quote(str(value), safe=" /") for key, value in tags.items()}
+        s3.put_object(Bucket=bucket, Key=f"{prefix}{name}.collapsed", Body=collapsed.encode("utf-8"),
+                      ContentType="text/plain", Metadata=metadata)
+        s3.put_object(Bucket=bucket, Key=f"{prefix}{name}.svg", Body=svg.encode("utf-8"),
+                      ContentType="image/svg+xml", Metadata=metadata)
+    return store
+
+def token_authorizer(token):
+    """Authorize profiling requests that present X-Profile-Token equal to token."""
+    def authorize(headers):
+        # Headers are latin-1 decoded; compare bytes so that non-ASCII input
+        # is just a mismatch and never fails the request
+        presented = headers.get("x-profile-token", "").encode("latin-1")
+        return bool(token) and hmac.compare_digest(presented, token.encode("utf-8"))
+    return authorize
+
+def tag_profile(request, **tags):
+    """Attach request parameters to the profile of this request, if any."""
+    request.state.profile_tags = tags
+
+class ProfilingMiddleware:
+    """Profile selected request paths on demand or every Nth request.
+
+    Only the thread running the event loop is sampled, so profiled handlers
+    should be async def (as /generate and /fractals/generate are). The
+    sampler sees whatever that thread runs, so other requests' coroutines
+    that run on the loop while a profiled request awaits are mixed into its
+    profile. Blocking handlers like the fractal renders hold the loop and
+    are unaffected; for the rest, read profiles from a quiet instance.
+    """
+
+    def __init__(self, app, paths, authorize, store, sample_every=0):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.authorize = authorize
+        self.store = store
+        self.sample_every = sample_every
+        self._counter = itertools.count(1)
+
+    def _requested(self, scope):
+        headers = Headers(scope=scope)
+        wanted = headers.get("x-profile") == "1" or \
+            parse_qs(scope.get("query_string", b"").decode("latin-1")).get("profile") == ["1"]
+        return wanted and self.authorize(headers)
+
+    def _save(self, name, counts, tags):
+        title = f"{tags['path']} " + " ".join(f"{k}={v}" for k, v in tags.items() if k != "path")
+        try:
+            self.store(name, collapsed_stacks(counts), render_flamegraph(counts, title), tags)
+        except Exception as e:
+            print(f"⚠️ Could not store profile {name}: {e}")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        sampled = self.sample_every > 0 and next(self._counter) % self.sample_every == 0
+        if not sampled and not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        # Handlers read this to forward profiling downstream and add tags
+        mode = "sampled" if sampled else "on-demand"
+        state = scope.setdefault("state", {})
+        state["profiling"] = mode
+        started = time.time()
+        sampler = StackSampler(threading.get_ident()).start()
+        profile = None
+
+        def stop():
+            # Cheap: only stops the sampler and names the profile
+            counts = sampler.stop()
+            tags = {
+                "path": scope["path"],
+                "mode": mode,
+                "duration_ms": int((time.time() - started) * 1000),
+                **state.get("profile_tags", {})
+            }
+            label = "-".join(str(tags[key]) for key in ("fractal_type", "depth") if key in tags)
+            name = time.strftime("%Y%m%d-%H%M%S", time.gmtime(started)) + \
+                f"-{scope['path'].strip('/').replace('/', '_')}{'-' + label if label else ''}" + \
+                f"-{uuid.uuid4().hex[:12]}"
+            return name, counts, tags
+
+        async def send_with_profile(message):
+            nonlocal profile
+            # The handler has returned once the response starts
+            if message["type"] == "http.response.start" and profile is None:
+                profile = stop()
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile[0].encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            if profile is None:
+                profile = stop()
+            # Not awaited: the connection is released while the thread works
+            asyncio.get_running_loop().run_in_executor(None, self._save, *profile)
@@ -1,6 +1,7 @@
 import os
-from fastapi import APIRouter
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi import APIRouter, Request
+from fastapi.responses import HTMLResponse
+from http_cache import make_etag, cached_response, precompress
 
 router = APIRouter()
 
@@ -8,8 +9,23 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 INDEX_PATH = os.path.join(TEMPLATES_DIR, "index.html")
 
+# Load the login page once at startup instead of stat-ing and streaming the
+# file on every hit, and compress it once rather than per request.
+# Browsers revalidate with If-None-Match and get a 304.
+def _load_index():
+    try:
+        with open(INDEX_PATH, "rb") as f:
+            return f.read()
+    except OSError as e:
+        print(f"⚠️ Could not load {INDEX_PATH}: {e}")
+        return None
+
+INDEX_HTML = _load_index()
+INDEX_ETAG = make_etag(INDEX_HTML) if INDEX_HTML is not None else None
+INDEX_VARIANTS = precompress(INDEX_HTML) if INDEX_HTML is not None else None
+
 @router.get("/")
-async def index():
-    if not os.path.exists(INDEX_PATH):
+async def index(request: Request):
+    if INDEX_HTML is None:
         return HTMLResponse("<h3>index.html not found in templates directory</h3>", status_code=404)
-    return FileResponse(INDEX_PATH)
\ No newline at end of file
+    return cached_response(request, INDEX_HTML, INDEX_ETAG, "public, no-cache", variants=INDEX_VARIANTS)
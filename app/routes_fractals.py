@@ -1,7 +1,11 @@
-import os, uuid, boto3, json
-from fastapi import APIRouter, Request, HTTPException, Form, BackgroundTasks
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
-from auth import verify_jwt_token
+import os, uuid, boto3, json, html, hashlib, functools
+from fastapi import APIRouter, Request, HTTPException, Form, BackgroundTasks, Query
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse, Response
+from starlette.background import BackgroundTask
+from auth import verify_jwt_token, get_parameter
+from profiling import tag_profile
+from http_cache import make_etag, cached_response, precompress
+from fractal_geometry import GEOMETRY_TYPES, LSYSTEM_TYPES, build_geometry, encode_geometry
 import requests
 
 router = APIRouter()
@@ -10,6 +14,40 @@ router = APIRouter()
 sqs = boto3.client('sqs', region_name='ap-southeast-2')
 FRACTAL_SERVICE_URL = "n11608676-autoscale-assesment3-785201285.ap-southeast-2.elb.amazonaws.com"  # Will be replaced with ALB URL
 SQS_QUEUE_URL = None  # Will be set after queue creation
+SQS_QUEUE_NAME = 'fractal-generation-queue.fifo'
+
+# FIFO ordering only holds within a message group, and only one message per
+# group is in flight at a time. Jobs are grouped per user so each user's
+# requests stay in order while different users are processed in parallel.
+# Set MESSAGE_GROUP_SHARDS > 0 to hash users into that many groups instead.
+MESSAGE_GROUP_SHARDS = 0
+
+def message_group_id(username):
+    digest = hashlib.sha256(username.encode("utf-8")).hexdigest()
+    if MESSAGE_GROUP_SHARDS > 0:
+        return f"fractal-generation-{int(digest, 16) % MESSAGE_GROUP_SHARDS}"
+    return f"user-{digest[:32]}"
+
+def request_fingerprint(username, depth, color, fractal_type, idempotency_key):
+    # Deterministic, so SQS deduplication and the worker's idempotency check
+    # both recognise a retried request
+    canonical = json.dumps({
+        "username": username,
+        "depth": depth,
+        "color": color,
+        "fractal_type": fractal_type,
+        "idempotency_key": idempotency_key
+    }, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+# An admin's on-demand profile of /fractals/generate only covers queueing,
+# so it is forwarded to the fractal service to profile the render too
+PROFILING_TOKEN = get_parameter('/fractal-app/profiling-token')
+
+def profile_headers(profile):
+    if profile and PROFILING_TOKEN:
+        return {"X-Profile": "1", "X-Profile-Token": PROFILING_TOKEN}
+    return {}
 
 # Initialize SQS queue
 def init_sqs_queue():
@@ -17,10 +55,14 @@ def init_sqs_queue():
     try:
         # Create SQS queue for fractal generation requests
         response = sqs.create_queue(
-            QueueName='fractal-generation-queue',
+            QueueName=SQS_QUEUE_NAME,
             Attributes={
                 'VisibilityTimeout': '300',  # 5 minutes
-                'MessageRetentionPeriod': '86400'  # 1 day
+                'MessageRetentionPeriod': '86400',  # 1 day
+                'FifoQueue': 'true',
+                # High-throughput FIFO: dedup and throughput limits per group
+                'DeduplicationScope': 'messageGroup',
+                'FifoThroughputLimit': 'perMessageGroupId'
             }
         )
         SQS_QUEUE_URL = response['QueueUrl']
@@ -29,7 +71,7 @@ def init_sqs_queue():
         print(f"⚠️ Using existing SQS queue: {e}")
         # Queue might already exist, try to get URL
         try:
-            response = sqs.get_queue_url(QueueName='fractal-generation-queue')
+            response = sqs.get_queue_url(QueueName=SQS_QUEUE_NAME)
             SQS_QUEUE_URL = response['QueueUrl']
         except Exception as e2:
             print(f"❌ Could not get SQS queue: {e2}")
@@ -41,9 +83,35 @@ init_sqs_queue()
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DASHBOARD_HTML = os.path.join(BASE_DIR, "templates", "dashboard.html")
 
+# Precompile the dashboard at startup: the template is split around the
+# username placeholder once, so a request only joins three byte strings.
+def load_dashboard_template():
+    try:
+        with open(DASHBOARD_HTML, "r", encoding="utf-8") as f:
+            template = f.read()
+    except OSError as e:
+        print(f"⚠️ Could not load {DASHBOARD_HTML}: {e}")
+        return None
+    return [part.encode("utf-8") for part in template.split("{{username}}")]
+
+DASHBOARD_PARTS = load_dashboard_template()
+DASHBOARD_ETAG_BASE = make_etag(*DASHBOARD_PARTS) if DASHBOARD_PARTS else None
+
+def js_string_literal(value):
+    # JSON string literal that is also safe inside an HTML <script> block
+    literal = json.dumps(value)
+    return literal.replace("<", "\\u003c").replace(">", "\\u003e").replace("&", "\\u0026")
+
+@functools.lru_cache(maxsize=128)
+def render_dashboard(username):
+    # Pages differ only by username, so each user's page is rendered and
+    # compressed once instead of on every hit. Quality 6 keeps the first
+    # hit cheap (a few ms) at nearly the size of quality 11.
+    body = js_string_literal(username).encode("utf-8").join(DASHBOARD_PARTS)
+    return body, make_etag(DASHBOARD_ETAG_BASE, username), precompress(body, brotli_quality=6)
+
 @router.get("/dashboard")
 def dashboard(request: Request):
-    # ... (keep your existing dashboard code)
     token = request.query_params.get("token")
     if not token:
         auth = request.headers.get("authorization")
@@ -58,27 +126,24 @@ def dashboard(request: Request):
         except HTTPException:
             return RedirectResponse(url="/")
     
-    if not os.path.exists(DASHBOARD_HTML):
+    if DASHBOARD_PARTS is None:
         return HTMLResponse(f"""
         <html>
             <head><title>Fractal Dashboard</title></head>
             <body>
                 <div class="container">
                     <h1>Fractal Dashboard</h1>
-                    <p>Welcome, {username}!</p>
+                    <p>Welcome, {html.escape(username)}!</p>
                     <a href="/">Back to Login</a>
                 </div>
             </body>
         </html>
         """)
     
-    try:
-        with open(DASHBOARD_HTML, "r", encoding="utf-8") as f:
-            html = f.read()
-        html = html.replace("{{username}}", username)
-        return HTMLResponse(html)
-    except Exception as e:
-        return HTMLResponse(f"<h3>Error loading dashboard: {str(e)}</h3>", status_code=500)
+    # The page is per user, so it may only be cached privately and must be
+    # revalidated; an unchanged page comes back as a 304
+    body, etag, variants = render_dashboard(username)
+    return cached_response(request, body, etag, "private, no-cache", variants=variants)
 
 # Background task to process SQS messages
 async def process_fractal_messages():
@@ -98,15 +163,20 @@ async def process_fractal_messages():
             try:
                 # Parse message body
                 body = json.loads(message['Body'])
+                profile = body.pop("profile", False)
                 
                 # Call fractal service
                 fractal_response = requests.post(
                     f"{FRACTAL_SERVICE_URL}/generate",
-                    data=body
+                    data=body,
+                    headers=profile_headers(profile)
                 )
                 
-                if fractal_response.status_code == 200:
-                    # Success - delete message from queue
+                if fractal_response.status_code == 409:
+                    # Another worker holds this request; let the message reappear
+                    print(f"⏳ Fractal request {body.get('request_id')} already in progress")
+                elif fractal_response.status_code == 200:
+                    # Success (or an already-completed duplicate) - delete message from queue
                     sqs.delete_message(
                         QueueUrl=SQS_QUEUE_URL,
                         ReceiptHandle=message['ReceiptHandle']
@@ -141,27 +211,39 @@ async def generate_fractal(
     if color not in valid_colors:
         color = "blue"
     
-    valid_types = ["tree", "snowflake", "sierpinski", "dragon", "fern", "circles"]
+    valid_types = ["tree", "snowflake", "sierpinski", "dragon", "fern", "circles", *LSYSTEM_TYPES]
     if fractal_type not in valid_types:
         fractal_type = "tree"
 
+    tag_profile(request, fractal_type=fractal_type, depth=depth, color=color, username=username)
+    profile = getattr(request.state, "profiling", None) == "on-demand"
+
     # Add background task to process messages
     background_tasks.add_task(process_fractal_messages)
 
+    # Clients send an Idempotency-Key per logical request and reuse it on
+    # retries. Without one, every call is treated as a new request.
+    idempotency_key = request.headers.get("idempotency-key") or str(uuid.uuid4())
+    request_id = request_fingerprint(username, depth, color, fractal_type, idempotency_key)
+
     if SQS_QUEUE_URL:
         # Send message to SQS for async processing
         message_body = {
             "depth": depth,
             "color": color,
             "fractal_type": fractal_type,
-            "username": username
+            "username": username,
+            "request_id": request_id
         }
+        if profile:
+            message_body["profile"] = True
         
         try:
             response = sqs.send_message(
                 QueueUrl=SQS_QUEUE_URL,
                 MessageBody=json.dumps(message_body),
-                MessageGroupId='fractal-generation'
+                MessageGroupId=message_group_id(username),
+                MessageDeduplicationId=request_id
             )
             
             return {
@@ -183,20 +265,109 @@ async def generate_fractal(
                 "depth": depth,
                 "color": color,
                 "fractal_type": fractal_type,
-                "username": username
-            }
+                "username": username,
+                "request_id": request_id
+            },
+            headers=profile_headers(profile)
         )
         
         if fractal_response.status_code == 200:
-            return fractal_response.json()
+            result = fractal_response.json()
+            if "x-profile-id" in fractal_response.headers:
+                result["profile_id"] = fractal_response.headers["x-profile-id"]
+            return result
+        elif fractal_response.status_code == 409:
+            raise HTTPException(409, "This fractal request is already being generated")
         else:
             raise HTTPException(500, f"Fractal service error: {fractal_response.text}")
-            
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, f"Error generating fractal: {str(e)}")
 
+@router.get("/fractals/animate")
+def animate_fractal(
+    request: Request,
+    depth: int = Query(..., ge=1, le=8),
+    color: str = Query("blue"),
+    fractal_type: str = Query("tree")
+):
+    # Token may come from the query string so the GIF can be used as an <img> src
+    token = request.query_params.get("token")
+    if not token:
+        auth = request.headers.get("authorization")
+        if not auth or not auth.lower().startswith("bearer "):
+            raise HTTPException(401, "Missing/invalid Authorization header")
+        token = auth.split(" ", 1)[1]
+    payload = verify_jwt_token(token)
+    username = payload.get("cognito:username", "user")
+
+    try:
+        fractal_response = requests.post(
+            f"{FRACTAL_SERVICE_URL}/generate/animation",
+            data={
+                "depth": depth,
+                "color": color,
+                "fractal_type": fractal_type,
+                "username": username
+            },
+            stream=True
+        )
+    except Exception as e:
+        raise HTTPException(500, f"Error animating fractal: {str(e)}")
+
+    if fractal_response.status_code != 200:
+        error_text = fractal_response.text
+        fractal_response.close()
+        raise HTTPException(500, f"Fractal service error: {error_text}")
+
+    # Relay frames as they arrive instead of buffering the whole GIF
+    return StreamingResponse(
+        fractal_response.iter_content(chunk_size=None),
+        media_type="image/gif",
+        headers={"Cache-Control": "no-store"},
+        background=BackgroundTask(fractal_response.close)
+    )
+
+@router.get("/fractals/geometry")
+def fractal_geometry(
+    request: Request,
+    depth: int = Query(..., ge=1, le=8),
+    fractal_type: str = Query("tree"),
+    encoding: str = Query("float32"),
+    delta: bool = Query(False)
+):
+    auth = request.headers.get("authorization")
+    if not auth or not auth.lower().startswith("bearer "):
+        raise HTTPException(401, "Missing/invalid Authorization header")
+    token = auth.split(" ", 1)[1]
+    verify_jwt_token(token)
+
+    if fractal_type not in GEOMETRY_TYPES:
+        raise HTTPException(400, f"Geometry is only available for: {', '.join(GEOMETRY_TYPES)}")
+    if encoding not in ("float32", "int16"):
+        raise HTTPException(400, "encoding must be float32 or int16")
+    if delta and encoding != "int16":
+        raise HTTPException(400, "delta encoding requires encoding=int16")
+
+    # Vertex arrays are built with NumPy here and drawn by the browser, so
+    # neither the fractal service nor matplotlib is involved. The response is
+    # compressed by CompressionMiddleware when the client accepts it.
+    primitive, vertices = build_geometry(fractal_type, depth)
+    body = encode_geometry(primitive, vertices, quantize=encoding == "int16", delta=delta)
+
+    # Only the tree is randomized; the other shapes are fixed per depth
+    cache_control = "no-store" if fractal_type == "tree" else "private, max-age=86400"
+    return Response(content=body, media_type="application/octet-stream",
+                    headers={"Cache-Control": cache_control})
+
 @router.get("/fractals/list")
-def list_fractals(request: Request):
+def list_fractals(
+    request: Request,
+    limit: int = Query(50, ge=1, le=100),
+    before: str = Query(None)
+):
     # ... (keep your existing list_fractals code)
     auth = request.headers.get("authorization")
     if not auth or not auth.lower().startswith("bearer "):
@@ -210,9 +381,18 @@ def list_fractals(request: Request):
         dynamo = boto3.resource('dynamodb', region_name='ap-southeast-2').Table('n11608676-FractalsTable')
         s3 = boto3.client('s3', region_name='ap-southeast-2')
         
+        # FractalIds are time-ordered (see fractal_ids.py), so a reverse query
+        # with Limit returns the newest N without reading the whole partition.
+        # The response's next_before is passed back as `before` for the next
+        # page; it is null once the oldest fractal has been returned.
+        key_condition = boto3.dynamodb.conditions.Key("Username").eq(username)
+        if before:
+            key_condition = key_condition & boto3.dynamodb.conditions.Key("FractalId").lt(before)
+
         resp = dynamo.query(
-            KeyConditionExpression=boto3.dynamodb.conditions.Key("Username").eq(username),
-            ScanIndexForward=False
+            KeyConditionExpression=key_condition,
+            ScanIndexForward=False,
+            Limit=limit
         )
         items = resp.get("Items", [])
         
@@ -228,7 +408,11 @@ def list_fractals(request: Request):
                 print(f"Error generating URL for {item['S3Key']}: {e}")
                 item["ImageURL"] = ""
         
-        return items
+        last_key = resp.get("LastEvaluatedKey")
+        return {
+            "items": items,
+            "next_before": last_key["FractalId"] if last_key else None
+        }
         
     except Exception as e:
         print(f"Error listing fractals: {e}")
@@ -0,0 +1,126 @@
+"""Geometry generation time: recursive generators vs the L-system engine.
+
+The recursive functions below are the generators fractal_service.py used
+before the L-system engine, changed only to return their points instead of
+drawing them. The tree keeps just its two main branches per node: the
+extra short side branches depend on the remaining depth, which a
+context-free L-system cannot express, so production still draws the tree
+recursively and TREE below exists only for this comparison. "cold" clears
+the expansion cache before every run and "warm" reuses it; TREE is not in
+that cache and is expanded afresh every time.
+
+Usage (from the repository root):
+    python benchmarks/bench_lsystem.py --repeat 5
+"""
+import argparse, os, sys, time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from lsystem import LSystem, expand, interpret, lsystem_polyline
+
+TREE = LSystem("Recursive Tree", "X", {"X": "F[+X][-X]"}, 30, start=(0.0, -2.0),
+               heading=90, length=1.5, branch_scale=0.65, angle_jitter=0.2,
+               length_jitter=0.08)
+
+def tree_lsystem(depth):
+    symbols = TREE.axiom
+    for _ in range(depth):
+        symbols = symbols.translate(TREE.table)
+    return interpret(TREE, symbols, depth)[0]
+
+def koch_recursive(depth):
+    def koch_curve(start, end, depth):
+        if depth == 0:
+            return [start, end]
+        diff = end - start
+        p1 = start + diff / 3
+        p3 = start + 2 * diff / 3
+        angle = np.pi / 3
+        rot = np.array([[np.cos(angle), -np.sin(angle)],
+                        [np.sin(angle), np.cos(angle)]])
+        p2 = p1 + rot @ (diff / 3)
+        return (koch_curve(start, p1, depth-1) + koch_curve(p1, p2, depth-1) +
+                koch_curve(p2, p3, depth-1) + koch_curve(p3, end, depth-1))
+
+    size = 2
+    points = [
+        np.array([0, size * np.sqrt(3)/3]),
+        np.array([-size/2, -size * np.sqrt(3)/6]),
+        np.array([size/2, -size * np.sqrt(3)/6])
+    ]
+    all_points = []
+    for i in range(3):
+        all_points.extend(koch_curve(points[i], points[(i+1) % 3], depth))
+    return np.array(all_points)
+
+def dragon_recursive(depth):
+    def dragon_curve(start, end, depth, direction=1):
+        if depth == 0:
+            return [start, end]
+        diff = end - start
+        perpendicular = np.array([-diff[1], diff[0]]) * direction
+        mid = (start + end) / 2 + perpendicular / 2
+        return dragon_curve(start, mid, depth-1, 1) + dragon_curve(mid, end, depth-1, -1)
+
+    return np.array(dragon_curve(np.array([-2, 0]), np.array([2, 0]), depth))
+
+def tree_recursive(depth):
+    segments = []
+
+    def draw_tree(x, y, length, angle, depth_left):
+        if depth_left == 0:
+            return
+        x_end = x + length * np.cos(angle)
+        y_end = y + length * np.sin(angle)
+        segments.append(((x, y), (x_end, y_end)))
+        new_length = length * (0.6 + 0.1 * np.random.random())
+        angle_variation = np.pi/6 * (0.8 + 0.4 * np.random.random())
+        if depth_left > 1:
+            draw_tree(x_end, y_end, new_length, angle + angle_variation, depth_left - 1)
+            draw_tree(x_end, y_end, new_length, angle - angle_variation, depth_left - 1)
+
+    draw_tree(0, -2, 1.5, np.pi/2, depth)
+    return np.array(segments)
+
+def timed(fn, repeat, cold):
+    best = float("inf")
+    for _ in range(repeat):
+        if cold:
+            expand.cache_clear()
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def dedupe(points):
+    # The recursive versions repeat each shared endpoint; drop the repeats
+    keep = np.r_[True, np.any(np.abs(np.diff(points, axis=0)) > 1e-12, axis=1)]
+    return points[keep]
+
+def main(repeat):
+    cases = [
+        ("snowflake", 6, koch_recursive, lambda d: lsystem_polyline("snowflake", d)),
+        ("dragon", 8, dragon_recursive, lambda d: lsystem_polyline("dragon", d)),
+        ("dragon", 14, dragon_recursive, lambda d: lsystem_polyline("dragon", d)),
+        ("tree", 8, tree_recursive, tree_lsystem),
+        ("tree", 14, tree_recursive, tree_lsystem),
+    ]
+    print(f"{'fractal':<10} {'depth':>5} {'recursive':>11} {'lsys cold':>11} {'lsys warm':>11} {'speedup':>8}  match")
+    for name, depth, recursive, engine in cases:
+        t_rec, expected = timed(lambda: recursive(depth), repeat, cold=False)
+        t_cold, actual = timed(lambda: engine(depth), repeat, cold=True)
+        t_warm, _ = timed(lambda: engine(depth), repeat, cold=False)
+        if name == "tree":
+            # Randomized, so compare the branch count instead of coordinates
+            match = len(expected) == len(actual)
+        else:
+            expected = dedupe(expected)
+            match = expected.shape == actual.shape and np.allclose(expected, actual)
+        print(f"{name:<10} {depth:>5} {t_rec * 1000:>9.2f}ms {t_cold * 1000:>9.2f}ms "
+              f"{t_warm * 1000:>9.2f}ms {t_rec / t_cold:>7.1f}x  {match}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args().repeat)
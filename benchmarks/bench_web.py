@@ -0,0 +1,93 @@
+"""Requests per second for the web tier's / and /dashboard pages.
+
+Drives main.app, with its real middleware stack, in-process (no sockets),
+so the numbers measure routing, template rendering, caching and compression
+rather than the network stack. The "legacy" rows re-create the old
+per-request file read on the same app for comparison. Browsers always send
+Accept-Encoding, so the "(compressed)" rows are the realistic ones.
+
+Usage (from the repository root):
+    python benchmarks/bench_web.py --requests 2000
+"""
+import argparse, asyncio, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from fastapi.responses import FileResponse, HTMLResponse
+from main import app as main_app
+from routes_core import INDEX_PATH, INDEX_ETAG
+from routes_fractals import DASHBOARD_HTML, DASHBOARD_ETAG_BASE
+from http_cache import make_etag
+
+def build_app():
+    app = main_app
+
+    @app.get("/legacy/")
+    async def legacy_index():
+        if not os.path.exists(INDEX_PATH):
+            return HTMLResponse("<h3>index.html not found in templates directory</h3>", status_code=404)
+        return FileResponse(INDEX_PATH)
+
+    @app.get("/legacy/dashboard")
+    def legacy_dashboard():
+        with open(DASHBOARD_HTML, "r", encoding="utf-8") as f:
+            html = f.read()
+        return HTMLResponse(html.replace("{{username}}", '"user"'))
+
+    return app
+
+async def request(app, path, headers):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "server": ("bench", 80), "client": ("bench", 1),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()]
+    }
+    status, size, received = None, 0, False
+
+    async def receive():
+        nonlocal received
+        if received:
+            # Client stays connected; responses cancel this wait when done
+            await asyncio.Event().wait()
+        received = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status, size
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, size
+
+async def bench(app, label, path, headers, n):
+    status, size = await request(app, path, headers)
+    start = time.perf_counter()
+    for _ in range(n):
+        await request(app, path, headers)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {status:>4} {size:>8} B {n / elapsed:>10.0f} req/s")
+
+async def main(n):
+    app = build_app()
+    gzip = {"accept-encoding": "gzip, br"}
+    dashboard_etag = make_etag(DASHBOARD_ETAG_BASE, "user")
+    print(f"{'case':<34} {'code':>4} {'body':>10} {'throughput':>16}")
+    await bench(app, "legacy /", "/legacy/", {}, n)
+    await bench(app, "legacy / (compressed)", "/legacy/", gzip, n)
+    await bench(app, "/", "/", {}, n)
+    await bench(app, "/ (compressed)", "/", gzip, n)
+    await bench(app, "/ (If-None-Match)", "/", {"if-none-match": INDEX_ETAG, **gzip}, n)
+    await bench(app, "legacy /dashboard", "/legacy/dashboard", {}, n)
+    await bench(app, "legacy /dashboard (compressed)", "/legacy/dashboard", gzip, n)
+    await bench(app, "/dashboard", "/dashboard", {}, n)
+    await bench(app, "/dashboard (compressed)", "/dashboard", gzip, n)
+    await bench(app, "/dashboard (If-None-Match)", "/dashboard", {"if-none-match": dashboard_etag, **gzip}, n)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    asyncio.run(main(parser.parse_args().requests))
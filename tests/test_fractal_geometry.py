@@ -0,0 +1,80 @@
+"""Round trips through the binary geometry format of /fractals/geometry.
+
+decode() mirrors decodeGeometry in templates/dashboard.html.
+
+Usage (from the repository root):
+    python -m pytest tests
+"""
+import os, sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from fractal_geometry import (GEOMETRY_HEADER, GEOMETRY_MAGIC, GEOMETRY_VERSION, PRIMITIVE_LINES,
+                              PRIMITIVE_LINE_STRIP, ENCODING_FLOAT32, ENCODING_INT16, FLAG_DELTA,
+                              build_geometry, encode_geometry)
+
+def decode(data):
+    magic, version, primitive, encoding, flags, count, min_x, min_y, max_x, max_y, _ = \
+        GEOMETRY_HEADER.unpack_from(data)
+    assert (magic, version) == (GEOMETRY_MAGIC, GEOMETRY_VERSION)
+    lo, hi = np.array([min_x, min_y]), np.array([max_x, max_y])
+    body = data[GEOMETRY_HEADER.size:]
+    if encoding == ENCODING_FLOAT32:
+        assert len(body) == count * 8
+        return primitive, flags, np.frombuffer(body, dtype="<f4").reshape(-1, 2).astype(np.float64), lo, hi
+
+    assert encoding == ENCODING_INT16 and len(body) == count * 4
+    values = np.frombuffer(body, dtype="<i2").reshape(-1, 2)
+    if flags & FLAG_DELTA:
+        # Accumulate in int16 so wrapped deltas come back around
+        values = np.cumsum(values, axis=0, dtype=np.int16)
+    span = np.where(hi > lo, hi - lo, 1.0)
+    return primitive, flags, lo + (values.astype(np.float64) + 32768) / 65535 * span, lo, hi
+
+def tolerance(vertices, quantize):
+    span = np.ptp(vertices, axis=0).max() if len(vertices) else 0.0
+    scale = np.abs(vertices).max() if len(vertices) else 0.0
+    # float32 header bounds, plus half a quantization step for int16
+    return 1e-6 * max(scale, 1.0) + (span / 65535 if quantize else 1e-6 * max(scale, 1.0))
+
+@pytest.mark.parametrize("quantize,delta", [(False, False), (True, False), (True, True)])
+@pytest.mark.parametrize("fractal_type,depth", [("snowflake", 4), ("dragon", 10), ("tree", 6),
+                                                ("sierpinski", 4), ("plant", 3)])
+def test_round_trip(fractal_type, depth, quantize, delta):
+    primitive, vertices = build_geometry(fractal_type, depth)
+    decoded_primitive, flags, decoded, _, _ = decode(encode_geometry(primitive, vertices, quantize, delta))
+    assert decoded_primitive == primitive
+    assert bool(flags & FLAG_DELTA) == delta
+    assert decoded.shape == vertices.shape
+    assert np.abs(decoded - vertices).max() <= tolerance(vertices, quantize)
+
+def test_delta_wraps_around_int16():
+    # Jumping between the bounding box corners is a step of 65535, which
+    # does not fit in int16 and must wrap
+    vertices = np.array([[0.0, 0.0], [10.0, 5.0], [0.0, 0.0], [10.0, 5.0], [2.5, 1.25]])
+    data = encode_geometry(PRIMITIVE_LINE_STRIP, vertices, quantize=True, delta=True)
+    raw = np.frombuffer(data[GEOMETRY_HEADER.size:], dtype="<i2").reshape(-1, 2)
+    assert raw[0].tolist() == [-32768, -32768]
+    assert raw[1].tolist() == [-1, -1]
+    _, _, decoded, _, _ = decode(data)
+    assert np.abs(decoded - vertices).max() <= tolerance(vertices, True)
+
+def test_header_bounds():
+    vertices = np.array([[-1.5, 2.0], [3.0, -4.0]])
+    _, _, decoded, lo, hi = decode(encode_geometry(PRIMITIVE_LINES, vertices))
+    assert lo.tolist() == [-1.5, -4.0] and hi.tolist() == [3.0, 2.0]
+    assert np.array_equal(decoded, vertices)
+
+def test_flat_axis_and_empty_geometry():
+    flat = np.array([[0.0, 1.0], [2.0, 1.0], [4.0, 1.0]])
+    _, _, decoded, _, _ = decode(encode_geometry(PRIMITIVE_LINE_STRIP, flat, quantize=True, delta=True))
+    assert np.abs(decoded - flat).max() <= tolerance(flat, True)
+
+    _, _, decoded, _, _ = decode(encode_geometry(PRIMITIVE_LINES, np.empty((0, 2)), quantize=True))
+    assert decoded.shape == (0, 2)
+
+def test_delta_requires_quantization():
+    with pytest.raises(ValueError):
+        encode_geometry(PRIMITIVE_LINES, np.zeros((2, 2)), quantize=False, delta=True)
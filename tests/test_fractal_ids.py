@@ -0,0 +1,38 @@
+"""Time-ordered fractal IDs sort in creation order.
+
+Usage (from the repository root):
+    python -m pytest tests
+"""
+import os, sys, uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from fractal_ids import new_fractal_id, is_time_ordered_id
+
+def test_ids_are_uuid7():
+    fractal_id = new_fractal_id()
+    parsed = uuid.UUID(fractal_id)
+    assert parsed.version == 7
+    assert parsed.variant == uuid.RFC_4122
+    assert str(parsed) == fractal_id
+
+def test_ids_sort_by_timestamp():
+    timestamps = [0, 1, 999, 1_000, 1_700_000_000_000, 1_700_000_000_001, 2**48 - 1]
+    ids = [new_fractal_id(ts) for ts in timestamps]
+    assert sorted(ids) == ids
+    # String order is also DynamoDB's sort key order
+    assert sorted(reversed(ids)) == ids
+
+def test_timestamp_prefix():
+    fractal_id = new_fractal_id(1_700_000_000_123)
+    assert uuid.UUID(fractal_id).int >> 80 == 1_700_000_000_123
+
+def test_same_millisecond_ids_are_unique():
+    ids = {new_fractal_id(1_700_000_000_000) for _ in range(1000)}
+    assert len(ids) == 1000
+
+def test_is_time_ordered_id():
+    assert is_time_ordered_id(new_fractal_id())
+    assert not is_time_ordered_id(str(uuid.uuid4()))
+    assert not is_time_ordered_id("request")
+    assert not is_time_ordered_id(None)
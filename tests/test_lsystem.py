@@ -0,0 +1,89 @@
+"""The vectorized turtle in lsystem.py against a plain stack-based turtle.
+
+Usage (from the repository root):
+    python -m pytest tests
+"""
+import os, sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from lsystem import LSYSTEMS, LSystem, expand, interpret
+
+# Jitter-free version of the branching tree, so the result is deterministic
+TREE = LSystem("Recursive Tree", "X", {"X": "F[+X][-X]"}, 30, start=(0.0, -2.0),
+               heading=90, length=1.5, branch_scale=0.65)
+
+PLAIN = LSystem("Plain", "F", {}, 90, start=(0.5, -1.0), heading=0, branch_scale=0.5)
+
+def stack_turtle(system, symbols, depth=0):
+    """Reference interpreter: one symbol at a time with an explicit stack."""
+    x, y = system.start
+    heading = np.radians(system.heading)
+    turn = np.radians(system.angle)
+    step = system.length * system.length_scale ** depth
+    stack, segments, nesting = [], [], []
+    for symbol in symbols:
+        if symbol in system.draw or symbol == "f":
+            length = step * system.branch_scale ** len(stack)
+            x_end, y_end = x + length * np.cos(heading), y + length * np.sin(heading)
+            if symbol in system.draw:
+                segments.append(((x, y), (x_end, y_end)))
+                nesting.append(len(stack))
+            x, y = x_end, y_end
+        elif symbol == "+":
+            heading += turn
+        elif symbol == "-":
+            heading -= turn
+        elif symbol == "[":
+            stack.append((x, y, heading))
+        elif symbol == "]":
+            x, y, heading = stack.pop()
+    return np.array(segments).reshape(-1, 2, 2), np.array(nesting, dtype=int)
+
+def assert_same_turtle(system, symbols, depth=0):
+    segments, nesting = interpret(system, symbols, depth)
+    expected_segments, expected_nesting = stack_turtle(system, symbols, depth)
+    assert segments.shape == expected_segments.shape
+    assert np.allclose(segments, expected_segments)
+    assert np.array_equal(nesting, expected_nesting)
+
+@pytest.mark.parametrize("depth", range(0, 7))
+def test_plant_matches_stack_turtle(depth):
+    assert_same_turtle(LSYSTEMS["plant"], expand("plant", depth), depth)
+
+@pytest.mark.parametrize("depth", range(0, 11))
+def test_tree_matches_stack_turtle(depth):
+    symbols = TREE.axiom
+    for _ in range(depth):
+        symbols = symbols.translate(TREE.table)
+    assert_same_turtle(TREE, symbols, depth)
+
+@pytest.mark.parametrize("symbols", [
+    "", "F", "[F]F", "F[]F", "[[F]]F", "[]", "[][]F", "F[+F][-F]F",
+    "F[+F[-F]F]-F", "[+F]+F", "F[f+F]fF", "F[X]F", "[[[F]+F]+F]+F"
+])
+def test_bracket_edge_cases(symbols):
+    assert_same_turtle(PLAIN, symbols)
+
+def random_balanced(rng, length):
+    symbols, open_brackets = [], 0
+    for _ in range(length):
+        symbol = rng.choice(list("FFf+-[]"))
+        if symbol == "]" and not open_brackets:
+            continue
+        open_brackets += {"[": 1, "]": -1}.get(symbol, 0)
+        symbols.append(symbol)
+    return "".join(symbols) + "]" * open_brackets
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_bracket_strings(seed):
+    rng = np.random.default_rng(seed)
+    assert_same_turtle(PLAIN, random_balanced(rng, 200))
+
+@pytest.mark.parametrize("name", ["snowflake", "dragon", "hilbert", "gosper", "levy"])
+def test_unbranched_curves_match_stack_turtle(name):
+    system = LSYSTEMS[name]
+    depth = min(4, system.max_depth)
+    assert_same_turtle(system, expand(name, depth), depth)
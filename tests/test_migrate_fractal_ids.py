@@ -0,0 +1,42 @@
+"""migrate_item rewrites legacy fractals and leaves idempotency markers alone.
+
+Usage (from the repository root):
+    python -m pytest tests
+"""
+import os, sys, uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from fractal_ids import new_fractal_id, is_time_ordered_id, IDEMPOTENCY_PARTITION_PREFIX, IDEMPOTENCY_SORT_KEY
+from migrate_fractal_ids import migrate_item
+
+def test_skips_idempotency_markers():
+    marker = {
+        "Username": f"{IDEMPOTENCY_PARTITION_PREFIX}abc123",
+        "FractalId": IDEMPOTENCY_SORT_KEY,
+        "RequestStatus": "done",
+        "ExpiresAt": 1_700_086_400
+    }
+    assert migrate_item(marker) is None
+    assert migrate_item({**marker, "Username": "someone"}) is None
+    assert migrate_item({**marker, "FractalId": str(uuid.uuid4())}) is None
+
+def test_rewrites_legacy_item():
+    legacy_id = str(uuid.uuid4())
+    item = {"Username": "alice", "FractalId": legacy_id, "CreatedAt": "1700000000", "S3Key": "k"}
+    new_item = migrate_item(item)
+    assert is_time_ordered_id(new_item["FractalId"])
+    assert uuid.UUID(new_item["FractalId"]).int >> 80 == 1_700_000_000_000
+    assert new_item["LegacyFractalId"] == legacy_id
+    assert new_item["CreatedAt"] == 1_700_000_000
+    assert new_item["S3Key"] == "k"
+
+def test_numeric_timestamp_only():
+    fractal_id = new_fractal_id()
+    new_item = migrate_item({"Username": "alice", "FractalId": fractal_id, "CreatedAt": "1700000000"})
+    assert new_item["FractalId"] == fractal_id
+    assert new_item["CreatedAt"] == 1_700_000_000
+    assert "LegacyFractalId" not in new_item
+
+def test_already_migrated():
+    assert migrate_item({"Username": "alice", "FractalId": new_fractal_id(), "CreatedAt": 1_700_000_000}) is None